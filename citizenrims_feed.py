@@ -16,15 +16,24 @@ Endpoints:
 """
 
 import argparse
+import gzip
+import hashlib
 import json
+import sys
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlencode, urlparse, parse_qs
 from urllib.request import Request, urlopen
 from urllib.error import HTTPError, URLError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 API_BASE = "https://api.v1.citizenrims.com"
 
 # Agency definitions: (url_prefix, name)
@@ -36,6 +45,52 @@ AGENCIES = [
     "smcsheriff",
 ]
 
+# Fields kept from upstream items; everything else is dropped at ingest to
+# keep the in-memory store and every serialized response small.
+INCIDENT_FIELDS = frozenset({
+    "incidentNumber", "street", "blockNumber", "city", "beat",
+    "incidentDate", "incidentTime", "xCoord", "yCoord",
+    "callType", "callTypeDescription", "callSubtype", "callSubtypeDescription",
+    "status", "dispositionDescription",
+    "_source", "_agency", "_prefix",
+})
+CASE_FIELDS = frozenset({
+    "caseNumber", "incidentNumber", "street", "blockNumber", "city", "beat",
+    "reportDate", "occurrence1Date", "occurrence1Time", "xCoord", "yCoord",
+    "crimeType", "crimeClassification", "offenseCode1", "offenseDescription1",
+    "disposition",
+    "_source", "_agency", "_prefix",
+})
+
+
+def json_loads(data):
+    """Parse JSON bytes/str, using orjson when it's installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(data):
+    """Serialize to JSON bytes, using orjson when it's installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str)
+    return json.dumps(data, default=str).encode()
+
+
+def http_request(url, method="GET", headers=None, data=None, timeout=30):
+    """Send a request with urlopen and return the body.
+
+    Responses are requested gzipped and decompressed here. Raises HTTPError
+    on 4xx/5xx.
+    """
+    headers = dict(headers or {}, **{"Accept-Encoding": "gzip"})
+    req = Request(url, method=method, headers=headers, data=data)
+    with urlopen(req, timeout=timeout) as resp:
+        body = resp.read()
+        if resp.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+    return body
+
 
 class TokenManager:
     def __init__(self):
@@ -53,14 +108,14 @@ class TokenManager:
             return self._token
 
     def _refresh(self):
-        req = Request(
+        body = http_request(
             f"{API_BASE}/api/v1/auth/citizen",
             method="POST",
             headers={"Content-Length": "0"},
             data=b"",
+            timeout=10,
         )
-        with urlopen(req, timeout=10) as resp:
-            return json.loads(resp.read())["token"]
+        return json_loads(body)["token"]
 
 
 class CitizenRIMSClient:
@@ -72,12 +127,10 @@ class CitizenRIMSClient:
     def _api_get(self, path, params):
         url = f"{API_BASE}{path}?{urlencode(params)}"
         token = self.token_manager.get_token()
-        req = Request(url, headers={
+        return json_loads(http_request(url, headers={
             "Authorization": f"Bearer {token}",
             "Accept": "application/json",
-        })
-        with urlopen(req, timeout=30) as resp:
-            return json.loads(resp.read())
+        }))
 
     def get_agency_config(self, prefix):
         if prefix in self._agency_configs:
@@ -96,62 +149,68 @@ class CitizenRIMSClient:
     def _get_type_list(self, marker_groups):
         return ",".join(g["groupFieldName"] for g in marker_groups)
 
-    def fetch_incidents(self, prefix):
-        config = self.get_agency_config(prefix)
-        if not config.get("incidentsEnabled"):
-            return []
+    def _date_window(self):
+        """(startDate, endDate) strings covering the last self.days days."""
         end = datetime.now()
-        start = end - timedelta(days=self.days)
-        groups = config.get("incidentMarkerGroups", [])
-        if not groups:
-            return []
-        params = {
+        return self._date_str(end - timedelta(days=self.days)), self._date_str(end)
+
+    def _build_common_params(self, config, window=None):
+        """Query parameters shared by the Incident and Case endpoints."""
+        start_date, end_date = window or self._date_window()
+        return {
             "agencyId": config["agencyId"],
             "primaryAgencyId": config["primaryAgencyId"],
-            "startDate": self._date_str(start),
-            "endDate": self._date_str(end),
-            "types": self._get_type_list(groups),
+            "startDate": start_date,
+            "endDate": end_date,
             "circleLatitude": config.get("defaultLatitude", 37.5),
             "circleLongitude": config.get("defaultLongitude", -122.2),
             "circleRadius": 50000,
         }
+
+    def fetch_incidents(self, prefix, window=None):
+        config = self.get_agency_config(prefix)
+        if not config.get("incidentsEnabled"):
+            return []
+        groups = config.get("incidentMarkerGroups", [])
+        if not groups:
+            return []
+        params = dict(self._build_common_params(config, window), types=self._get_type_list(groups))
         try:
             items = self._api_get("/api/v1/Incident", params)
-            for item in items:
-                item["_source"] = "incident"
-                item["_agency"] = config.get("agencySiteName", prefix)
-                item["_prefix"] = prefix
-            return items
+            # The tags repeat across every item, so share one string object each
+            agency = sys.intern(config.get("agencySiteName", prefix))
+            prefix = sys.intern(prefix)
+            return [
+                dict(
+                    {k: v for k, v in item.items() if k in INCIDENT_FIELDS},
+                    _source="incident", _agency=agency, _prefix=prefix,
+                )
+                for item in items
+            ]
         except HTTPError as e:
             print(f"[WARN] Failed to fetch incidents for {prefix}: {e}")
             return []
 
-    def fetch_cases(self, prefix):
+    def fetch_cases(self, prefix, window=None):
         config = self.get_agency_config(prefix)
         if not config.get("caseDataEnabled"):
             return []
-        end = datetime.now()
-        start = end - timedelta(days=self.days)
         groups = config.get("caseMarkerGroups", [])
         if not groups:
             return []
-        params = {
-            "agencyId": config["agencyId"],
-            "primaryAgencyId": config["primaryAgencyId"],
-            "startDate": self._date_str(start),
-            "endDate": self._date_str(end),
-            "types": self._get_type_list(groups),
-            "circleLatitude": config.get("defaultLatitude", 37.5),
-            "circleLongitude": config.get("defaultLongitude", -122.2),
-            "circleRadius": 50000,
-        }
+        params = dict(self._build_common_params(config, window), types=self._get_type_list(groups))
         try:
             items = self._api_get("/api/v1/Case", params)
-            for item in items:
-                item["_source"] = "case"
-                item["_agency"] = config.get("agencySiteName", prefix)
-                item["_prefix"] = prefix
-            return items
+            # The tags repeat across every item, so share one string object each
+            agency = sys.intern(config.get("agencySiteName", prefix))
+            prefix = sys.intern(prefix)
+            return [
+                dict(
+                    {k: v for k, v in item.items() if k in CASE_FIELDS},
+                    _source="case", _agency=agency, _prefix=prefix,
+                )
+                for item in items
+            ]
         except HTTPError as e:
             print(f"[WARN] Failed to fetch cases for {prefix}: {e}")
             return []
@@ -159,13 +218,38 @@ class CitizenRIMSClient:
     def fetch_all(self):
         all_incidents = []
         all_cases = []
-        for prefix in AGENCIES:
-            print(f"  Fetching {prefix}...")
-            all_incidents.extend(self.fetch_incidents(prefix))
-            all_cases.extend(self.fetch_cases(prefix))
+        # Format the date range once for every agency's incident and case queries
+        window = self._date_window()
+        print(f"  Fetching {', '.join(AGENCIES)}...")
+        with ThreadPoolExecutor(max_workers=len(AGENCIES) * 2) as pool:
+            # Load configs up front so the incident and case fetches for a
+            # prefix don't both miss the cache and request it twice.
+            list(pool.map(self.get_agency_config, AGENCIES))
+            futures = [
+                (pool.submit(self.fetch_incidents, p, window), pool.submit(self.fetch_cases, p, window))
+                for p in AGENCIES
+            ]
+            for incidents, cases in futures:
+                all_incidents.extend(incidents.result())
+                all_cases.extend(cases.result())
         return all_incidents, all_cases
 
 
+def _index_by_prefix(items):
+    by_prefix = {}
+    for item in items:
+        by_prefix.setdefault(item.get("_prefix"), []).append(item)
+    return by_prefix
+
+
+# Unfiltered feed endpoints, pre-serialized on every refresh: path -> lists in the body
+FEED_PATHS = {
+    "/": ("incidents", "cases"),
+    "/incidents": ("incidents",),
+    "/cases": ("cases",),
+}
+
+
 class DataStore:
     def __init__(self, client, refresh_interval):
         self.client = client
@@ -173,6 +257,8 @@ class DataStore:
         self._incidents = []
         self._cases = []
         self._last_refresh = None
+        self._by_prefix = {"incidents": {}, "cases": {}}
+        self._bodies = {}
         self._lock = threading.Lock()
 
     def start_background_refresh(self):
@@ -189,21 +275,66 @@ class DataStore:
         print(f"[{datetime.now().isoformat()}] Refreshing data...")
         try:
             incidents, cases = self.client.fetch_all()
+            last_refresh = datetime.now().isoformat()
+            bodies = self._serialize(incidents, cases, last_refresh)
+            by_prefix = {"incidents": _index_by_prefix(incidents), "cases": _index_by_prefix(cases)}
             with self._lock:
                 self._incidents = incidents
                 self._cases = cases
-                self._last_refresh = datetime.now().isoformat()
+                self._by_prefix = by_prefix
+                self._last_refresh = last_refresh
+                self._bodies = bodies
             print(f"  Got {len(incidents)} incidents, {len(cases)} cases")
         except Exception as e:
             print(f"[ERROR] Refresh failed: {e}")
 
+    def _serialize(self, incidents, cases, last_refresh):
+        """Render each FEED_PATHS body, plain and gzipped, once per refresh."""
+        meta = {
+            "last_refresh": last_refresh,
+            "incident_count": len(incidents),
+            "case_count": len(cases),
+        }
+        lists = {"incidents": incidents, "cases": cases}
+        bodies = {}
+        for path, keys in FEED_PATHS.items():
+            data = {"meta": meta}
+            for key in keys:
+                data[key] = lists[key]
+            body = json_dumps(data)
+            # Weak ETag: the plain and gzipped bodies are the same content
+            etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            bodies[path] = (body, gzip.compress(body), etag)
+        return bodies
+
+    def get_body(self, path, gzipped=False):
+        """(body, etag) for a FEED_PATHS endpoint, or (None, None) before the first refresh."""
+        with self._lock:
+            bodies = self._bodies.get(path)
+        if bodies is None:
+            return None, None
+        return (bodies[1] if gzipped else bodies[0]), bodies[2]
+
+    def get_by_prefix(self, kind, prefixes):
+        """Incidents or cases (kind) for the given agency prefixes, in feed order."""
+        with self._lock:
+            index = self._by_prefix[kind]
+        return [item for prefix, items in index.items() if prefix in prefixes for item in items]
+
+    # The lists are replaced wholesale on refresh, never mutated, so callers
+    # get the live reference and must treat it as read-only.
     def get_incidents(self):
         with self._lock:
-            return list(self._incidents)
+            return self._incidents
 
     def get_cases(self):
         with self._lock:
-            return list(self._cases)
+            return self._cases
+
+    def has_data(self):
+        """True once a refresh has succeeded."""
+        with self._lock:
+            return self._last_refresh is not None
 
     def get_meta(self):
         with self._lock:
@@ -221,7 +352,55 @@ class FeedHandler(BaseHTTPRequestHandler):
         parsed = urlparse(self.path)
         path = parsed.path.rstrip("/") or "/"
         params = parse_qs(parsed.query)
+        # JSON compresses 5-10x; level 1 keeps the CPU cost close to a copy
+        use_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+
+        body = etag = None
+        if path in FEED_PATHS and "agency" not in params:
+            body, etag = self.store.get_body(path, gzipped=use_gzip)
+            if etag and self._etag_matches(etag):
+                self.send_response(304)
+                self._send_cache_headers(etag)
+                self.end_headers()
+                return
+        if body is None:
+            data = self._build_data(path, params)
+            if data is None:
+                self.send_error(404)
+                return
+            body = json_dumps(data)
+            if use_gzip:
+                body = gzip.compress(body, compresslevel=1)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self._send_cache_headers(etag)
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
+    def _send_cache_headers(self, etag):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if self.store.has_data():
+            self.send_header("Cache-Control", f"public, max-age={self.store.refresh_interval}")
+        else:
+            # Keep downstream caches from holding on to the empty pre-refresh feed
+            self.send_header("Cache-Control", "no-store")
+        self.send_header("Vary", "Accept-Encoding")
+        if etag:
+            self.send_header("ETag", etag)
+
+    def _etag_matches(self, etag):
+        inm = self.headers.get("If-None-Match")
+        if not inm:
+            return False
+        # Weak comparison, per RFC 7232 for If-None-Match
+        tags = [t.strip() for t in inm.split(",")]
+        return "*" in tags or etag in tags or etag[2:] in tags
+
+    def _build_data(self, path, params):
         if path == "/":
             data = {
                 "meta": self.store.get_meta(),
@@ -252,25 +431,16 @@ class FeedHandler(BaseHTTPRequestHandler):
                 "note": "Palo Alto PD (papd) exists on CitizenRIMS but has all data feeds disabled.",
             }
         else:
-            self.send_error(404)
-            return
+            return None
 
         # Optional agency filter: ?agency=menlopark,atherton
         agency_filter = params.get("agency")
         if agency_filter:
             prefixes = agency_filter[0].split(",")
-            if "incidents" in data:
-                data["incidents"] = [i for i in data["incidents"] if i.get("_prefix") in prefixes]
-            if "cases" in data:
-                data["cases"] = [c for c in data["cases"] if c.get("_prefix") in prefixes]
-
-        body = json.dumps(data, default=str).encode()
-        self.send_response(200)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Content-Length", str(len(body)))
-        self.end_headers()
-        self.wfile.write(body)
+            for kind in ("incidents", "cases"):
+                if kind in data:
+                    data[kind] = self.store.get_by_prefix(kind, prefixes)
+        return data
 
     def log_message(self, fmt, *args):
         print(f"[HTTP] {args[0]}")
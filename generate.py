@@ -4,23 +4,32 @@ Fetches crime data from CitizenRIMS and writes static JSON files to public/.
 Designed to run in GitHub Actions on a cron schedule.
 """
 
+import functools
+import gzip
 import json
 import math
 import os
 import re
 import smtplib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from email.message import EmailMessage
 from urllib.request import Request, urlopen
 from urllib.parse import urlencode
 from urllib.error import HTTPError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 API_BASE = "https://api.v1.citizenrims.com"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUT_DIR = os.path.join(BASE_DIR, "public")
 ALERTED_PATH = os.path.join(BASE_DIR, "alerted.json")
 ALERT_LOG_PATH = os.path.join(BASE_DIR, "alert_log.json")
+CONFIG_CACHE_PATH = os.path.join(BASE_DIR, "configs.json")
+CONFIG_TTL = timedelta(hours=24)
 
 AGENCIES = ["menlopark", "atherton", "smcsheriff"]
 
@@ -37,17 +46,25 @@ MENLO_OAKS_POLY = [
 THREE_MILES_M = 4828
 QUARTER_MILE_M = 402
 
+# The alert patterns are all lowercase literals and are matched against
+# crime_text(item).lower(): lowercasing once is several times faster than
+# re.IGNORECASE, which case-folds every character the engine tries.
 ALERT_RE = re.compile(
     r"burglary|larceny|theft|fraud|stolen|shoplift|embezzle|forgery|identity|vandal|arson"
-    r"|suspicious\s*person|prowler|trespass",
-    re.IGNORECASE,
+    r"|suspicious\s*person|prowler|trespass"
 )
 # Exclude noise from alerts
 EXCLUDE_RE = re.compile(
-    r"shoplift|petty.theft|484\s*theft|alarm.{0,5}burglary|burglary.{0,5}alarm",
-    re.IGNORECASE,
+    r"shoplift|petty.theft|484\s*theft|alarm.{0,5}burglary|burglary.{0,5}alarm"
 )
 
+# Suspicious person/prowler/trespass alerts use the tighter 0.25mi radius
+NEAR_ONLY_RE = re.compile(r"suspicious\s*person|prowler|trespass")
+
+# Alert severity: High wins if any high keyword appears, else Medium
+SEVERITY_HIGH_RE = re.compile(r"burglary|stolen vehicle|arson")
+SEVERITY_MEDIUM_RE = re.compile(r"theft|shoplift|fraud|larceny|vandal|forgery|identity|embezzle")
+
 ALERT_RECIPIENTS = [
     r.strip() for r in os.environ.get("ALERT_RECIPIENTS", "").split(",") if r.strip()
 ]
@@ -55,123 +72,183 @@ ALERT_RECIPIENTS = [
 MAP_URL = "https://rayhe.github.io/citizenrims/public/"
 
 
+def json_loads(data):
+    """Parse JSON bytes/str, using orjson when it's installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(data):
+    """Serialize to compact JSON bytes, using orjson when it's installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str)
+    return json.dumps(data, separators=(",", ":"), default=str).encode()
+
+
+def write_json(path, fields):
+    """Write a JSON object from (key, json_dumps(value)) pairs.
+
+    Pieces are written one after another, so no file-sized copy is built
+    on top of the already-serialized values.
+    """
+    with open(path, "wb") as f:
+        f.write(b"{")
+        for n, (key, value) in enumerate(fields):
+            if n:
+                f.write(b",")
+            f.write(json_dumps(key))
+            f.write(b":")
+            f.write(value)
+        f.write(b"}")
+
+
+def http_request(url, method="GET", headers=None, data=None, timeout=30):
+    """Send a request with urlopen and return the body.
+
+    Responses are requested gzipped and decompressed here. Raises HTTPError
+    on 4xx/5xx.
+    """
+    headers = dict(headers or {}, **{"Accept-Encoding": "gzip"})
+    req = Request(url, method=method, headers=headers, data=data)
+    with urlopen(req, timeout=timeout) as resp:
+        body = resp.read()
+        if resp.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+    return body
+
+
 def get_token():
-    req = Request(
+    body = http_request(
         f"{API_BASE}/api/v1/auth/citizen",
         method="POST",
         headers={"Content-Length": "0"},
         data=b"",
+        timeout=10,
     )
-    with urlopen(req, timeout=10) as resp:
-        return json.loads(resp.read())["token"]
+    return json_loads(body)["token"]
 
 
 def api_get(path, params, token):
     url = f"{API_BASE}{path}?{urlencode(params)}"
-    req = Request(url, headers={
+    return json_loads(http_request(url, headers={
         "Authorization": f"Bearer {token}",
         "Accept": "application/json",
-    })
-    with urlopen(req, timeout=30) as resp:
-        return json.loads(resp.read())
+    }))
 
 
 def date_str(dt):
     return dt.strftime("%a %b %d %Y")
 
 
-def fetch_agency(prefix, token, days):
+def load_config_cache():
+    if os.path.exists(CONFIG_CACHE_PATH):
+        try:
+            with open(CONFIG_CACHE_PATH, "rb") as f:
+                cache = json_loads(f.read())
+            if isinstance(cache, dict):
+                return cache
+        except ValueError:
+            pass
+    return {}
+
+
+def save_config_cache(cache):
+    with open(CONFIG_CACHE_PATH, "w") as f:
+        f.write(json.dumps(cache, indent=2, sort_keys=True))
+
+
+def get_agency_config(prefix, token, cache):
+    """Return the agency config, refetching it once the cached copy is a day old."""
+    entry = cache.get(prefix)
+    now = datetime.now(timezone.utc)
+    try:
+        fetched = datetime.fromisoformat(entry["fetched"])
+        if now - fetched < CONFIG_TTL and isinstance(entry["config"], dict):
+            return entry["config"]
+    except (KeyError, TypeError, ValueError):
+        pass  # no entry, or a malformed one: refetch
     config = api_get(
         "/api/v1/AgencyConfig/AgencyConfigGetByUrlPrefix",
         {"citizenRimsUrlPrefix": prefix},
         token,
     )
-    end = datetime.now()
-    start = end - timedelta(days=days)
+    cache[prefix] = {"fetched": now.isoformat(), "config": config}
+    return config
+
+
+def fetch_agency(prefix, token, config_cache, start_date, end_date):
+    config = get_agency_config(prefix, token, config_cache)
     agency_name = config.get("agencySiteName", prefix)
-    agency_id = config["agencyId"]
-    primary_id = config["primaryAgencyId"]
-    lat = config.get("defaultLatitude", 37.5)
-    lng = config.get("defaultLongitude", -122.2)
+    common = {
+        "agencyId": config["agencyId"],
+        "primaryAgencyId": config["primaryAgencyId"],
+        "startDate": start_date,
+        "endDate": end_date,
+        "circleLatitude": config.get("defaultLatitude", 37.5),
+        "circleLongitude": config.get("defaultLongitude", -122.2),
+        "circleRadius": 50000,
+    }
 
-    incidents = []
-    if config.get("incidentsEnabled"):
-        groups = config.get("incidentMarkerGroups", [])
-        if groups:
-            types = ",".join(g["groupFieldName"] for g in groups)
-            try:
-                items = api_get("/api/v1/Incident", {
-                    "agencyId": agency_id,
-                    "primaryAgencyId": primary_id,
-                    "startDate": date_str(start),
-                    "endDate": date_str(end),
-                    "types": types,
-                    "circleLatitude": lat,
-                    "circleLongitude": lng,
-                    "circleRadius": 50000,
-                }, token)
-                for item in items:
-                    item["_source"] = "incident"
-                    item["_agency"] = agency_name
-                    item["_prefix"] = prefix
-                incidents = items
-            except HTTPError as e:
-                print(f"  WARN: incidents failed for {prefix}: {e}")
-
-    cases = []
-    if config.get("caseDataEnabled"):
-        groups = config.get("caseMarkerGroups", [])
-        if groups:
-            types = ",".join(g["groupFieldName"] for g in groups)
-            try:
-                items = api_get("/api/v1/Case", {
-                    "agencyId": agency_id,
-                    "primaryAgencyId": primary_id,
-                    "startDate": date_str(start),
-                    "endDate": date_str(end),
-                    "types": types,
-                    "circleLatitude": lat,
-                    "circleLongitude": lng,
-                    "circleRadius": 50000,
-                }, token)
-                for item in items:
-                    item["_source"] = "case"
-                    item["_agency"] = agency_name
-                    item["_prefix"] = prefix
-                cases = items
-            except HTTPError as e:
-                print(f"  WARN: cases failed for {prefix}: {e}")
-
-    return incidents, cases
-
-
-def fetch_paloalto(days):
+    def fetch(path, source, enabled_key, groups_key):
+        if not config.get(enabled_key):
+            return []
+        groups = config.get(groups_key, [])
+        if not groups:
+            return []
+        types = ",".join(g["groupFieldName"] for g in groups)
+        try:
+            items = api_get(path, dict(common, types=types), token)
+        except HTTPError as e:
+            print(f"  WARN: {source}s failed for {prefix}: {e}")
+            return []
+        # One bulk update per item is cheaper than three separate setitems
+        tags = {"_source": source, "_agency": agency_name, "_prefix": prefix}
+        for item in items:
+            item.update(tags)
+        return items
+
+    # The incident and case queries only depend on the config, so run them together
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        incidents = pool.submit(fetch, "/api/v1/Incident", "incident", "incidentsEnabled", "incidentMarkerGroups")
+        cases = pool.submit(fetch, "/api/v1/Case", "case", "caseDataEnabled", "caseMarkerGroups")
+        return incidents.result(), cases.result()
+
+
+def _paloalto_query(params):
+    url = f"{PA_BASE}?{urlencode(params)}"
+    return json_loads(http_request(url, headers={"Accept": "application/json"}, timeout=60))
+
+
+def fetch_paloalto(days, now=None):
     """Fetch incidents from Palo Alto's ArcGIS REST endpoint."""
-    cutoff = datetime.now() - timedelta(days=days)
+    # The TIMESTAMP literal is local wall-clock time, like the CitizenRIMS dates
+    cutoff = (now or datetime.now(timezone.utc)).astimezone() - timedelta(days=days)
     where = f"CALLTIME >= TIMESTAMP '{cutoff.strftime('%Y-%m-%d %H:%M:%S')}'"
 
-    all_features = []
-    offset = 0
     batch = 1000
-    while True:
-        params = urlencode({
-            "where": where,
-            "outFields": "*",
-            "f": "json",
-            "resultRecordCount": batch,
-            "resultOffset": offset,
-            "returnGeometry": "true",
-            "outSR": "4326",
-        })
-        url = f"{PA_BASE}?{params}"
-        req = Request(url, headers={"Accept": "application/json"})
-        with urlopen(req, timeout=60) as resp:
-            data = json.loads(resp.read())
-        features = data.get("features", [])
-        all_features.extend(features)
-        if not data.get("exceededTransferLimit") or len(features) < batch:
-            break
-        offset += len(features)
+    query = {
+        "where": where,
+        "outFields": "*",
+        "f": "json",
+        "resultRecordCount": batch,
+        "returnGeometry": "true",
+        "outSR": "4326",
+    }
+    # Ask for the row count first so every page can be requested at once
+    # instead of walking resultOffset one round-trip at a time.
+    total = _paloalto_query({"where": where, "returnCountOnly": "true", "f": "json"}).get("count", 0)
+    offsets = range(0, total, batch)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        pages = list(pool.map(_paloalto_query, [dict(query, resultOffset=o) for o in offsets]))
+
+    # Rows logged after the count query spill past the last page
+    offset = len(pages) * batch
+    while pages and pages[-1].get("exceededTransferLimit"):
+        pages.append(_paloalto_query(dict(query, resultOffset=offset)))
+        offset += batch
+
+    all_features = [feat for page in pages for feat in page.get("features", [])]
 
     incidents = []
     for feat in all_features:
@@ -190,9 +267,10 @@ def fetch_paloalto(days):
 
         call_time = attr.get("CALLTIME")
         if call_time:
-            dt = datetime.fromtimestamp(call_time / 1000, tz=timezone.utc)
-            inc_date = dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-            inc_time = dt.strftime("%H:%M:%S")
+            # Slice isoformat() rather than strftime twice: "YYYY-MM-DDTHH:MM:SS+00:00"
+            iso = datetime.fromtimestamp(call_time / 1000, tz=timezone.utc).isoformat(timespec="seconds")
+            inc_date = iso[:19] + "Z"
+            inc_time = iso[11:19]
         else:
             inc_date, inc_time = None, None
 
@@ -217,14 +295,19 @@ def fetch_paloalto(days):
     return incidents
 
 
+# Meters per degree of latitude (and of cos-scaled longitude) on a 6371km sphere
+METERS_PER_DEGREE = 6371000 * math.pi / 180
+
+
 def haversine_m(lat1, lon1, lat2, lon2):
     """Distance in meters between two lat/lng points."""
     R = 6371000
     phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlam = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    s_dphi = math.sin((phi2 - phi1) / 2)
+    s_dlam = math.sin(math.radians(lon2 - lon1) / 2)
+    a = s_dphi * s_dphi + math.cos(phi1) * math.cos(phi2) * s_dlam * s_dlam
+    # asin form: one sqrt instead of atan2(sqrt(a), sqrt(1 - a))
+    return R * 2 * math.asin(math.sqrt(min(1.0, a)))
 
 
 def point_in_polygon(lat, lng, poly):
@@ -241,31 +324,36 @@ def point_in_polygon(lat, lng, poly):
     return inside
 
 
-def _point_to_segment_m(lat, lng, lat1, lng1, lat2, lng2):
-    """Minimum distance in meters from point to a line segment."""
+def _closest_point_on_segment(lat, lng, lat1, lng1, lat2, lng2):
+    """Projection of a point onto a line segment, clamped to its endpoints."""
     dx = lat2 - lat1
     dy = lng2 - lng1
     if dx == 0 and dy == 0:
-        return haversine_m(lat, lng, lat1, lng1)
+        return lat1, lng1
     t = ((lat - lat1) * dx + (lng - lng1) * dy) / (dx * dx + dy * dy)
     t = max(0.0, min(1.0, t))
-    proj_lat = lat1 + t * dx
-    proj_lng = lng1 + t * dy
-    return haversine_m(lat, lng, proj_lat, proj_lng)
+    return lat1 + t * dx, lng1 + t * dy
 
 
 def distance_to_polygon_m(lat, lng, poly):
     """Distance in meters from point to polygon. 0 if inside."""
     if point_in_polygon(lat, lng, poly):
         return 0
+    # Work in a local flat projection (longitude scaled by cos(lat)). Within
+    # a few miles this is within ~1.5m of haversine, well under the alert
+    # radii, and avoids the trig calls.
+    kx = math.cos(math.radians(lat))
     n = len(poly)
-    min_dist = float('inf')
+    best_d2 = float('inf')
     for i in range(n):
         j = (i + 1) % n
-        d = _point_to_segment_m(lat, lng, poly[i][0], poly[i][1], poly[j][0], poly[j][1])
-        if d < min_dist:
-            min_dist = d
-    return min_dist
+        p = _closest_point_on_segment(lat, lng, poly[i][0], poly[i][1], poly[j][0], poly[j][1])
+        dlat = p[0] - lat
+        dlng = (p[1] - lng) * kx
+        d2 = dlat * dlat + dlng * dlng
+        if d2 < best_d2:
+            best_d2 = d2
+    return math.sqrt(best_d2) * METERS_PER_DEGREE
 
 
 def item_id(item):
@@ -284,8 +372,17 @@ def crime_text(item):
     ]))
 
 
-def is_alertable_crime(item):
-    ct = crime_text(item)
+def is_alertable_crime(item, ct=None):
+    """ct is crime_text(item), in any case, if the caller already has it."""
+    if ct is None:
+        ct = crime_text(item)
+    return is_alertable_text(ct.lower())
+
+
+# Crime texts repeat heavily (hundreds of "traffic stop"s), so most calls are cache hits
+@functools.lru_cache(maxsize=1024)
+def is_alertable_text(ct):
+    """Alert/exclude check on already-lowercased crime text."""
     if not ALERT_RE.search(ct):
         return False
     # Exclude burglary alarms, shoplifting, petty theft
@@ -294,25 +391,47 @@ def is_alertable_crime(item):
     return True
 
 
+def _expanded_bbox(poly, margin_m):
+    """(min_lat, max_lat, min_lng, max_lng) of poly grown by margin_m on every side."""
+    lats = [p[0] for p in poly]
+    lngs = [p[1] for p in poly]
+    dlat = margin_m / METERS_PER_DEGREE
+    # Use the smallest cos(lat) in the box so the longitude margin is never short
+    dlng = dlat / math.cos(math.radians(max(map(abs, lats)) + dlat))
+    return min(lats) - dlat, max(lats) + dlat, min(lngs) - dlng, max(lngs) + dlng
+
+
+# Anything outside this box is farther than 3mi from the polygon
+MENLO_OAKS_BBOX = _expanded_bbox(MENLO_OAKS_POLY, THREE_MILES_M)
+
+
 def item_within_menlo_oaks(item):
+    """(within 3mi, distance in meters).
+
+    Distance is None when none was computed: the item has no coordinates or
+    the bbox rejected it.
+    """
     lat = item.get("yCoord")
     lng = item.get("xCoord")
     if lat is None or lng is None:
-        return False, 0
+        return False, None
+    min_lat, max_lat, min_lng, max_lng = MENLO_OAKS_BBOX
+    if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+        return False, None
     dist = distance_to_polygon_m(lat, lng, MENLO_OAKS_POLY)
     return dist <= THREE_MILES_M, dist
 
 
 def load_alerted():
     if os.path.exists(ALERTED_PATH):
-        with open(ALERTED_PATH) as f:
-            return set(json.load(f))
+        with open(ALERTED_PATH, "rb") as f:
+            return set(json_loads(f.read()))
     return set()
 
 
 def save_alerted(ids):
     with open(ALERTED_PATH, "w") as f:
-        json.dump(sorted(ids), f)
+        f.write(json.dumps(sorted(ids)))
 
 
 def log_alert(item, dist_m, subject, status, error=None):
@@ -338,10 +457,49 @@ def log_alert(item, dist_m, subject, status, error=None):
         entry["error"] = str(error)
     log.append(entry)
     with open(ALERT_LOG_PATH, "w") as f:
-        json.dump(log, f, indent=2)
+        f.write(json.dumps(log, indent=2))
 
 
-def send_alert(item, dist_m):
+def open_smtp():
+    """Log in to Gmail SMTP once for a batch of alerts; None if unconfigured or down."""
+    smtp_user = os.environ.get("ALERT_EMAIL_USER", "")
+    smtp_pass = os.environ.get("ALERT_EMAIL_PASSWORD", "")
+    if not smtp_user or not smtp_pass or not ALERT_RECIPIENTS:
+        return None
+    try:
+        smtp = smtplib.SMTP_SSL("smtp.gmail.com", 465)
+    except Exception as e:
+        print(f"    WARN: SMTP connect failed: {e}")
+        return None
+    try:
+        smtp.login(smtp_user, smtp_pass)
+    except Exception as e:
+        print(f"    WARN: SMTP login failed: {e}")
+        smtp.close()
+        return None
+    return smtp
+
+
+def alert_subject(item, dist_m):
+    """(subject line, crime label, severity) for an alert email."""
+    if item.get("_source", "") == "incident":
+        crime = item.get("callType") or item.get("callTypeDescription") or "Crime"
+    else:
+        crime = item.get("offenseDescription1") or item.get("crimeType") or "Property Crime"
+
+    ct = crime_text(item).lower()
+    severity = "High"
+    if not SEVERITY_HIGH_RE.search(ct) and SEVERITY_MEDIUM_RE.search(ct):
+        severity = "Medium"
+
+    # Short location for subject line
+    short_loc = item.get("street", "Unknown location") or item.get("city", "") or "Unknown"
+    subject = f"[MOSI] {crime} near {short_loc} — {dist_m / 1609.34:.1f}mi from Menlo Oaks ({severity})"
+    return subject, crime, severity
+
+
+def send_alert(item, dist_m, smtp=None):
+    """Email one alert, over `smtp` if given, else on a connection of its own."""
     smtp_user = os.environ.get("ALERT_EMAIL_USER", "")
     smtp_pass = os.environ.get("ALERT_EMAIL_PASSWORD", "")
     if not smtp_user or not smtp_pass:
@@ -359,26 +517,13 @@ def send_alert(item, dist_m):
     dist_mi = dist_m / 1609.34
 
     if src == "incident":
-        crime = item.get("callType") or item.get("callTypeDescription") or "Crime"
         date_raw = item.get("incidentDate", "")
         time_raw = item.get("incidentTime", "")
     else:
-        crime = item.get("offenseDescription1") or item.get("crimeType") or "Property Crime"
         date_raw = item.get("reportDate") or item.get("occurrence1Date", "")
         time_raw = ""
 
-    ct = crime_text(item)
-    severity = "High"
-    if re.search(r"burglary|stolen vehicle|arson", ct, re.IGNORECASE):
-        severity = "High"
-    elif re.search(r"theft|shoplift|fraud|larceny", ct, re.IGNORECASE):
-        severity = "Medium"
-    elif re.search(r"vandal|forgery|identity|embezzle", ct, re.IGNORECASE):
-        severity = "Medium"
-
-    # Short location for subject line
-    short_loc = street or city or "Unknown"
-    subject = f"[MOSI] {crime} near {short_loc} — {dist_mi:.1f}mi from Menlo Oaks ({severity})"
+    subject, crime, severity = alert_subject(item, dist_m)
 
     # Format date nicely
     date_display = date_raw
@@ -429,19 +574,33 @@ def send_alert(item, dist_m):
   <p style="text-align:center;color:#aaa;font-size:11px;margin-top:12px">Crime Feed — Menlo Park, Atherton, Palo Alto &amp; SMC Sheriff</p>
 </div>"""
 
-    msg = MIMEMultipart("alternative")
+    msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = smtp_user
     msg["To"] = ", ".join(ALERT_RECIPIENTS)
 
     plain = f"{crime}\n{location}\n{agency}\nDistance: {dist_mi:.1f}mi from Menlo Oaks\nDate: {date_display}\nSeverity: {severity}\n\nView map: {MAP_URL}"
-    msg.attach(MIMEText(plain, "plain"))
-    msg.attach(MIMEText(html, "html"))
+    msg.set_content(plain)
+    msg.add_alternative(html, subtype="html")
 
-    try:
+    def send_on_new_connection():
         with smtplib.SMTP_SSL("smtp.gmail.com", 465) as s:
             s.login(smtp_user, smtp_pass)
-            s.sendmail(smtp_user, ALERT_RECIPIENTS, msg.as_string())
+            s.send_message(msg, smtp_user, ALERT_RECIPIENTS)
+
+    try:
+        if smtp is None:
+            send_on_new_connection()
+        else:
+            try:
+                smtp.send_message(msg, smtp_user, ALERT_RECIPIENTS)
+            except smtplib.SMTPException as e:
+                # The shared connection may have been dropped (idle timeout,
+                # 421 rate limit); close it so the caller logs in again, and
+                # resend this one on a fresh connection
+                print(f"    WARN: SMTP send failed ({e}), retrying on a new connection")
+                smtp.close()
+                send_on_new_connection()
         print(f"    Sent alert: {subject}")
         log_alert(item, dist_m, subject, "sent")
     except Exception as e:
@@ -452,55 +611,121 @@ def send_alert(item, dist_m):
 def check_alerts(all_incidents, all_cases):
     alerted = load_alerted()
     all_items = all_incidents + all_cases
-    new_alerts = 0
+    to_send = []
 
     for item in all_items:
         iid = item_id(item)
         if iid in alerted:
             continue
-        if not is_alertable_crime(item):
+        # Cheap checks first: regexes on the crime text, then the polygon math
+        ct = crime_text(item).lower()
+        if not is_alertable_crime(item, ct):
             continue
         within, dist = item_within_menlo_oaks(item)
         if not within:
             continue
         # Suspicious person/prowler/trespass: tighter radius (0.25mi)
-        ct = crime_text(item)
-        if re.search(r"suspicious\s*person|prowler|trespass", ct, re.IGNORECASE):
-            if dist > QUARTER_MILE_M:
-                continue
-
-        print(f"  NEW ALERT: {crime_text(item)} at {item.get('street', '?')} ({dist/1609.34:.1f}mi)")
-        send_alert(item, dist)
+        if NEAR_ONLY_RE.search(ct) and dist > QUARTER_MILE_M:
+            continue
+        to_send.append((item, dist))
+        # Recorded whether or not the email goes out: the archive is never
+        # pruned, so retrying failures on later runs would resend forever
         alerted.add(iid)
-        new_alerts += 1
 
-    save_alerted(alerted)
+    # One SMTP login for the whole batch instead of one per alert
+    configured = bool(os.environ.get("ALERT_EMAIL_USER") and os.environ.get("ALERT_EMAIL_PASSWORD")
+                      and ALERT_RECIPIENTS)
+    smtp = open_smtp() if to_send and configured else None
+    try:
+        for item, dist in to_send:
+            print(f"  NEW ALERT: {crime_text(item)} at {item.get('street', '?')} ({dist/1609.34:.1f}mi)")
+            if smtp is not None and smtp.sock is None:
+                # The previous send dropped the shared connection; log in again once
+                smtp = open_smtp()
+            if configured and smtp is None:
+                # Login failed; don't retry it for every remaining alert
+                subject = alert_subject(item, dist)[0]
+                print("    WARN: email failed: SMTP unavailable")
+                log_alert(item, dist, subject, "failed", error="SMTP unavailable")
+                continue
+            send_alert(item, dist, smtp=smtp)
+    finally:
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                pass
+
+    # Most runs alert on nothing; skip re-sorting and rewriting the file then
+    new_alerts = len(to_send)
+    if new_alerts or not os.path.exists(ALERTED_PATH):
+        save_alerted(alerted)
     print(f"  Alerts: {new_alerts} new, {len(alerted)} total tracked")
 
 
+def feed_age_seconds():
+    """Seconds since the last run's output was generated, or None if unknown.
+
+    Reads meta from cases.json, which every run writes with the same meta as
+    feed.json but is a fraction of its size.
+    """
+    try:
+        with open(os.path.join(OUT_DIR, "cases.json"), "rb") as f:
+            generated_at = json_loads(f.read())["meta"]["generated_at"]
+        return (datetime.now(timezone.utc) - datetime.fromisoformat(generated_at)).total_seconds()
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
 def main():
     days = int(os.environ.get("DAYS", "7"))
+    # Skip the whole run if the last one was recent enough (0 = always run).
+    # Uses meta.generated_at rather than the file mtime, which a fresh
+    # checkout resets.
+    min_interval = int(os.environ.get("MIN_INTERVAL_SEC", "0"))
+    if min_interval > 0:
+        age = feed_age_seconds()
+        if age is not None and age < min_interval:
+            print(f"Last run was {age:.0f}s ago (< MIN_INTERVAL_SEC={min_interval}), skipping")
+            return
     print(f"Fetching {days} days of data...")
 
     token = get_token()
+    config_cache = load_config_cache()
+    cached_configs = dict(config_cache)
+    # One clock reading for the whole run, so every agency, Palo Alto and the
+    # feed metadata agree on the window
+    now = datetime.now(timezone.utc)
+    end = now.astimezone()
+    start_date, end_date = date_str(end - timedelta(days=days)), date_str(end)
 
     all_incidents = []
     all_cases = []
 
-    for prefix in AGENCIES:
-        print(f"  {prefix}...")
-        incidents, cases = fetch_agency(prefix, token, days)
-        all_incidents.extend(incidents)
-        all_cases.extend(cases)
-        print(f"    {len(incidents)} incidents, {len(cases)} cases")
+    # Every source is independent network I/O, so fetch them all at once.
+    # Results are still collected in AGENCIES order to keep output stable.
+    with ThreadPoolExecutor(max_workers=len(AGENCIES) + 1) as pool:
+        agency_futures = [
+            (prefix, pool.submit(fetch_agency, prefix, token, config_cache, start_date, end_date))
+            for prefix in AGENCIES
+        ]
+        pa_future = pool.submit(fetch_paloalto, days, now)
+
+        for prefix, future in agency_futures:
+            incidents, cases = future.result()
+            all_incidents.extend(incidents)
+            all_cases.extend(cases)
+            print(f"  {prefix}: {len(incidents)} incidents, {len(cases)} cases")
 
-    print("  paloalto (ArcGIS)...")
-    try:
-        pa_incidents = fetch_paloalto(days)
-        all_incidents.extend(pa_incidents)
-        print(f"    {len(pa_incidents)} incidents")
-    except Exception as e:
-        print(f"  WARN: Palo Alto fetch failed: {e}")
+        try:
+            pa_incidents = pa_future.result()
+            all_incidents.extend(pa_incidents)
+            print(f"  paloalto (ArcGIS): {len(pa_incidents)} incidents")
+        except Exception as e:
+            print(f"  WARN: Palo Alto fetch failed: {e}")
+
+    if config_cache != cached_configs:
+        save_config_cache(config_cache)
 
     all_agencies = AGENCIES + ["paloalto"]
 
@@ -509,8 +734,8 @@ def main():
     archive_path = os.path.join(OUT_DIR, "feed.json")
     if os.path.exists(archive_path):
         try:
-            with open(archive_path) as f:
-                archive = json.load(f)
+            with open(archive_path, "rb") as f:
+                archive = json_loads(f.read())
             seen = {}
             for item in archive.get("incidents", []):
                 seen[item_id(item)] = item
@@ -529,22 +754,28 @@ def main():
             print(f"  WARN: could not load archive: {e}")
 
     meta = {
-        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "generated_at": now.isoformat(),
         "days": days,
         "agencies": all_agencies,
         "incident_count": len(all_incidents),
         "case_count": len(all_cases),
     }
 
-    def write(name, data):
+    # Serialize each part once; feed.json and the split files share the bytes
+    parts = {
+        "meta": json_dumps(meta),
+        "incidents": json_dumps(all_incidents),
+        "cases": json_dumps(all_cases),
+    }
+
+    def write(name, keys):
         path = os.path.join(OUT_DIR, name)
-        with open(path, "w") as f:
-            json.dump(data, f, separators=(",", ":"), default=str)
+        write_json(path, [(key, parts[key]) for key in keys])
         print(f"  Wrote {path} ({os.path.getsize(path)} bytes)")
 
-    write("feed.json", {"meta": meta, "incidents": all_incidents, "cases": all_cases})
-    write("incidents.json", {"meta": meta, "incidents": all_incidents})
-    write("cases.json", {"meta": meta, "cases": all_cases})
+    write("feed.json", ("meta", "incidents", "cases"))
+    write("incidents.json", ("meta", "incidents"))
+    write("cases.json", ("meta", "cases"))
 
     print("Checking alerts...")
     check_alerts(all_incidents, all_cases)
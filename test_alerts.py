@@ -12,13 +12,22 @@ Frequency context (31 days, ~1400 incidents + ~100 cases):
   - Vandalism / Identity / Forgery:      ~10/mo  (3mi radius from boundary)
 """
 
+import contextlib
+import io
+import json
+import math
 import re
+import smtplib
 import sys
 import os
+import tempfile
 import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
 sys.path.insert(0, os.path.dirname(__file__))
 
+import generate
 from generate import (
     haversine_m,
     is_alertable_crime,
@@ -27,6 +36,7 @@ from generate import (
     item_id,
     point_in_polygon,
     distance_to_polygon_m,
+    _closest_point_on_segment,
     MENLO_OAKS_POLY,
     THREE_MILES_M,
     QUARTER_MILE_M,
@@ -77,15 +87,18 @@ def make_case(offense="", crime_type="", classification="", miles=0, prefix="men
     }
 
 
+SUSPICIOUS_RE = re.compile(r"suspicious\s*person|prowler|trespass", re.IGNORECASE)
+
+
 def would_alert(item):
     """Simulate check_alerts() logic for a single item (no email/dedup)."""
-    if not is_alertable_crime(item):
+    ct = crime_text(item)
+    if not is_alertable_crime(item, ct):
         return False
     within, dist = item_within_menlo_oaks(item)
     if not within:
         return False
-    ct = crime_text(item)
-    if re.search(r"suspicious\s*person|prowler|trespass", ct, re.IGNORECASE):
+    if SUSPICIOUS_RE.search(ct):
         if dist > QUARTER_MILE_M:
             return False
     return True
@@ -224,19 +237,19 @@ ALERT_CASES = [
 
 
 class TestWouldAlert(unittest.TestCase):
-    """Data-driven: each row in ALERT_CASES becomes a test."""
-    pass
+    """Data-driven: each row in ALERT_CASES runs as a subtest."""
 
+    def test_alert_cases(self):
+        for name, miles, expected, builder in ALERT_CASES:
+            with self.subTest(case=name, miles=miles):
+                result = would_alert(builder(miles))
+                self.assertEqual(result, expected, f"{name} @ {miles}mi from boundary: expected {expected}, got {result}")
 
-for _name, _miles, _expected, _builder in ALERT_CASES:
-    def _make_test(name=_name, miles=_miles, builder=_builder, expected=_expected):
-        def test(self):
-            item = builder(miles)
-            result = would_alert(item)
-            self.assertEqual(result, expected, f"{name} @ {miles}mi from boundary: expected {expected}, got {result}")
-        return test
-    safe = f"{_name}_{_miles}mi".lower().replace(' ', '_').replace('-', '_').replace('.', '_')
-    setattr(TestWouldAlert, f"test_{safe}", _make_test())
+    def test_precomputed_text_any_case(self):
+        item = make_case(offense="Burglary - Residential (F)")
+        for ct in (crime_text(item), crime_text(item).lower(), "BURGLARY"):
+            with self.subTest(ct=ct):
+                self.assertTrue(is_alertable_crime(item, ct))
 
 
 class TestPolygonGeometry(unittest.TestCase):
@@ -252,6 +265,24 @@ class TestPolygonGeometry(unittest.TestCase):
     def test_far_point_outside_polygon(self):
         self.assertFalse(point_in_polygon(37.50, -122.17, MENLO_OAKS_POLY))
 
+    def test_flat_distance_matches_haversine(self):
+        """The flat projection stays within 1.5m of haversine out to 3mi."""
+        n = len(MENLO_OAKS_POLY)
+        kx = math.cos(math.radians(POLY_CENTER_LAT))
+        for bearing in range(0, 360, 30):
+            for miles in (0.5, 1, 2, 3):
+                r = miles * MILES_TO_DEG
+                lat = POLY_CENTER_LAT + r * math.cos(math.radians(bearing))
+                lng = POLY_CENTER_LNG + r * math.sin(math.radians(bearing)) / kx
+                expected = min(
+                    haversine_m(lat, lng, *_closest_point_on_segment(
+                        lat, lng, *MENLO_OAKS_POLY[i], *MENLO_OAKS_POLY[(i + 1) % n]))
+                    for i in range(n)
+                )
+                with self.subTest(bearing=bearing, miles=miles):
+                    self.assertAlmostEqual(distance_to_polygon_m(lat, lng, MENLO_OAKS_POLY),
+                                           expected, delta=1.5)
+
     def test_0mi_inside(self):
         lat, lng = coords_at(0)
         dist = distance_to_polygon_m(lat, lng, MENLO_OAKS_POLY)
@@ -279,10 +310,157 @@ class TestPolygonGeometry(unittest.TestCase):
         dist = distance_to_polygon_m(lat, lng, MENLO_OAKS_POLY)
         self.assertGreater(dist, THREE_MILES_M, f"{dist:.0f}m should be > {THREE_MILES_M}m (3mi)")
 
+    def test_bbox_rejects_far_point(self):
+        # San Francisco: far outside the 3mi box, rejected without a distance
+        within, dist = item_within_menlo_oaks({"yCoord": 37.7749, "xCoord": -122.4194})
+        self.assertFalse(within)
+        self.assertIsNone(dist)
+
+    def test_bbox_keeps_points_just_inside_3mi(self):
+        lat, lng = coords_at(2.9)
+        within, dist = item_within_menlo_oaks({"yCoord": lat, "xCoord": lng})
+        self.assertTrue(within, f"{dist}m should be within {THREE_MILES_M}m (3mi)")
+
+    def test_bbox_keeps_points_just_inside_3mi_east_west(self):
+        # Exercises the cos(lat)-scaled longitude margin of the box
+        east = max(MENLO_OAKS_POLY, key=lambda p: p[1])
+        west = min(MENLO_OAKS_POLY, key=lambda p: p[1])
+        for name, (lat, lng), sign in (("east", east, 1), ("west", west, -1)):
+            lng += sign * 2.9 * MILES_TO_DEG / math.cos(math.radians(lat))
+            with self.subTest(side=name):
+                within, dist = item_within_menlo_oaks({"yCoord": lat, "xCoord": lng})
+                self.assertTrue(within, f"{dist}m should be within {THREE_MILES_M}m (3mi)")
+
     def test_missing_coords(self):
         item = {"_source": "incident", "yCoord": None, "xCoord": None}
-        within, _ = item_within_menlo_oaks(item)
+        within, dist = item_within_menlo_oaks(item)
         self.assertFalse(within)
+        self.assertIsNone(dist)
+
+
+class FakeSMTP:
+    """Stand-in for smtplib.SMTP_SSL whose server drops the connection after
+    `per_connection` messages (0 = every send fails)."""
+    per_connection = 1
+    login_fails = False
+    sent = []
+    logins = 0
+
+    def __init__(self, host, port):
+        self.sock = object()
+        self.count = 0
+
+    def login(self, user, password):
+        FakeSMTP.logins += 1
+        if self.login_fails:
+            raise smtplib.SMTPAuthenticationError(535, b"Username and Password not accepted")
+
+    def send_message(self, msg, from_addr, to_addrs):
+        if self.sock is None or self.count >= self.per_connection:
+            self.close()
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.count += 1
+        FakeSMTP.sent.append(msg["Subject"])
+
+    def close(self):
+        self.sock = None
+
+    quit = close
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TestCheckAlerts(unittest.TestCase):
+    """check_alerts() batching over one SMTP connection."""
+
+    def run_alerts(self, n, per_connection=1, login_fails=False, runs=1):
+        """(alerted ids, alert_log entries) after `runs` check_alerts() calls."""
+        items = []
+        for i in range(n):
+            item = make_incident(call_type="Burglary - Residential")
+            item["incidentNumber"] = f"20260101000{i}"
+            items.append(item)
+        FakeSMTP.per_connection = per_connection
+        FakeSMTP.login_fails = login_fails
+        FakeSMTP.sent = []
+        FakeSMTP.logins = 0
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(generate, "ALERTED_PATH", os.path.join(tmp, "alerted.json")), \
+                mock.patch.object(generate, "ALERT_LOG_PATH", os.path.join(tmp, "alert_log.json")), \
+                mock.patch.object(generate, "ALERT_RECIPIENTS", ["to@example.com"]), \
+                mock.patch.dict(os.environ, {"ALERT_EMAIL_USER": "u", "ALERT_EMAIL_PASSWORD": "p"}), \
+                mock.patch("smtplib.SMTP_SSL", FakeSMTP), \
+                contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(runs):
+                generate.check_alerts(items, [])
+            with open(generate.ALERT_LOG_PATH) as f:
+                return generate.load_alerted(), json.load(f)
+
+    def test_dropped_connection_is_reopened(self):
+        alerted, log = self.run_alerts(3, per_connection=1)
+        self.assertEqual(len(FakeSMTP.sent), 3)
+        self.assertEqual(len(alerted), 3)
+        self.assertEqual([e["status"] for e in log], ["sent"] * 3)
+
+    def test_failed_login_is_not_retried(self):
+        # One login attempt for the batch, and failed ids are still recorded so
+        # later runs don't retry them
+        alerted, log = self.run_alerts(5, login_fails=True, runs=3)
+        self.assertEqual(FakeSMTP.logins, 1)
+        self.assertEqual(FakeSMTP.sent, [])
+        self.assertEqual(len(alerted), 5)
+        self.assertEqual([e["status"] for e in log], ["failed"] * 5)
+
+
+class TestAgencyConfigCache(unittest.TestCase):
+    """get_agency_config() 24h cache in configs.json."""
+
+    CONFIG = {"agencyId": 1, "primaryAgencyId": 1}
+
+    def get(self, cache):
+        """(config, whether it was refetched) for menlopark."""
+        with mock.patch.object(generate, "api_get", return_value=self.CONFIG) as api_get:
+            config = generate.get_agency_config("menlopark", "token", cache)
+        return config, api_get.called
+
+    def entry(self, age):
+        fetched = datetime.now(timezone.utc) - age
+        return {"fetched": fetched.isoformat(), "config": {"agencyId": 2}}
+
+    def test_fresh_entry_is_a_hit(self):
+        config, refetched = self.get({"menlopark": self.entry(timedelta(hours=1))})
+        self.assertFalse(refetched)
+        self.assertEqual(config, {"agencyId": 2})
+
+    def test_stale_entry_is_refetched(self):
+        cache = {"menlopark": self.entry(timedelta(hours=25))}
+        config, refetched = self.get(cache)
+        self.assertTrue(refetched)
+        self.assertEqual(config, self.CONFIG)
+        self.assertEqual(cache["menlopark"]["config"], self.CONFIG)
+
+    def test_corrupt_entry_is_refetched(self):
+        for entry in ("junk", [], {}, {"fetched": "yesterday", "config": {}},
+                      {"fetched": "2026-01-01T00:00:00", "config": {}},
+                      {"fetched": datetime.now(timezone.utc).isoformat(), "config": None}):
+            with self.subTest(entry=entry):
+                config, refetched = self.get({"menlopark": entry})
+                self.assertTrue(refetched)
+                self.assertEqual(config, self.CONFIG)
+
+    def test_corrupt_cache_file_is_empty(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "configs.json")
+            with mock.patch.object(generate, "CONFIG_CACHE_PATH", path):
+                for data in ("{not json", "[1, 2]"):
+                    with self.subTest(data=data):
+                        with open(path, "w") as f:
+                            f.write(data)
+                        self.assertEqual(generate.load_config_cache(), {})
 
 
 class TestItemId(unittest.TestCase):